@@ -1,26 +1,34 @@
+import asyncio
 from typing import Dict, Any
 from autogen_agentchat.agents import AssistantAgent, UserProxyAgent
 # from autogen_agentchat.base import ConversableAgent
 from config import make_llm_config, FREE_MODELS
 from utils import load_prompt
-from tools import PythonCodeRunner,web_search
+from tools import PythonCodeRunner
 from autogen_core import CancellationToken
 from autogen_core.code_executor import CodeBlock
 from autogen_ext.code_executors.local import LocalCommandLineCodeExecutor
 from autogen_ext.tools.code_execution import PythonCodeExecutionTool
-def create_all_agents() -> Dict[str, Any]:
-    """Creates and returns all agents with assigned models and prompts."""
+def create_all_agents(interactive: bool = True) -> Dict[str, Any]:
+    """Creates and returns all agents with assigned models and prompts.
+
+    Headless callers (service, distributed workers) pass interactive=False: there is then no
+    user_proxy (it is None), so chats never wait on stdin.
+    """
     
     llm_configs = {
         "coding": make_llm_config(FREE_MODELS["coding"]),
         "reasoning": make_llm_config(FREE_MODELS["reasoning"]),
         "general": make_llm_config(FREE_MODELS["general"]),
+        # JSON mode for agents whose replies are validated by schemas.parse_structured
+        "reasoning_json": make_llm_config(FREE_MODELS["reasoning"], json_output=True),
+        "coding_json": make_llm_config(FREE_MODELS["coding"], json_output=True),
     }
     code_runner = PythonCodeRunner()
     agents = {
         "task_analyzer": AssistantAgent(
             name="task_analyzer",
-            model_client=llm_configs["reasoning"],
+            model_client=llm_configs["reasoning_json"],
             system_message=load_prompt("task_analyzer") or "You analyze tasks and recommend reasoning strategies."
         ),
 
@@ -40,7 +48,7 @@ def create_all_agents() -> Dict[str, Any]:
 
         "testwriter": AssistantAgent(
             name="testwriter",
-            model_client=llm_configs["coding"],
+            model_client=llm_configs["coding_json"],
             system_message=load_prompt("testcase") or "Write comprehensive test cases for Python functions."
         ),
 
@@ -56,6 +64,13 @@ def create_all_agents() -> Dict[str, Any]:
             system_message="You provide detailed logical analysis and improvements."
         ),
 
+        # Same role as the reasoner's critiques, but answers in the client's JSON mode
+        "reviewer": AssistantAgent(
+            name="reviewer",
+            model_client=llm_configs["reasoning_json"],
+            system_message="You critique code implementations and score them from 0 to 10. Reply with a JSON object."
+        ),
+
         "quick_reasoner": AssistantAgent(
             name="quick_reasoner",
             model_client=llm_configs["reasoning"],
@@ -77,7 +92,15 @@ def create_all_agents() -> Dict[str, Any]:
 
         "user_proxy": UserProxyAgent(
             name="user_proxy",
-        )
+        ) if interactive else None
     }
 
-    return agents
\ No newline at end of file
+    return agents
+
+def reset_agents(agents: Dict[str, Any]):
+    """Clears every agent's conversation state while keeping its model client warm."""
+    async def reset_all():
+        for agent in agents.values():
+            if agent is not None:
+                await agent.on_reset(CancellationToken())
+    asyncio.run(reset_all())
@@ -0,0 +1,115 @@
+# checkpoint.py
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import time
+
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", ".checkpoints")
+
+# Pipeline stages in the order they complete
+STAGES = ["analysis", "plan", "refined_plan", "candidate_code", "test_cases"]
+
+
+def task_hash(task: str) -> str:
+    """Stable short hash identifying a task across runs."""
+    normalized = " ".join(task.split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def is_usable(value) -> bool:
+    """Returns True only for non-empty JSON-native values (str, dict, list).
+
+    Rejects the 'Error: ...' strings the chat helpers return on failure, and anything
+    else (coroutines, message objects) that would only survive json.dump as its repr.
+    """
+    if isinstance(value, str):
+        return bool(value.strip()) and not value.startswith("Error:")
+    if isinstance(value, (dict, list)):
+        return bool(value)
+    return False
+
+
+class CheckpointStore:
+    """File-backed store of pipeline stage outputs keyed by task hash."""
+
+    def __init__(self, root: str = CHECKPOINT_DIR):
+        self.root = root
+
+    def _task_dir(self, task: str) -> str:
+        return os.path.join(self.root, task_hash(task))
+
+    def _path(self, task: str, stage: str, strategy: str = None) -> str:
+        name = f"{strategy}.{stage}" if strategy else stage
+        return os.path.join(self._task_dir(task), f"{name}.json")
+
+    def _write(self, path: str, payload: dict):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Unique temp file per write: concurrent writers (service threads, workers) never share one
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(payload, f, default=str)
+            # Atomic rename so a crash mid-write never leaves a corrupt checkpoint
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _read(self, path: str):
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def save(self, task: str, stage: str, value, strategy: str = None):
+        """Records a completed stage and drops any partial output it supersedes."""
+        if not is_usable(value):
+            raise ValueError(f"Refusing to checkpoint non-JSON value for stage '{stage}': {type(value).__name__}")
+        self._write(self._path(task, stage, strategy), {"stage": stage, "saved_at": time.time(), "value": value})
+        partial_path = self._path(task, f"{stage}.partial", strategy)
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+    def load(self, task: str, stage: str, strategy: str = None, default=None):
+        payload = self._read(self._path(task, stage, strategy))
+        if payload is None:
+            return default
+        return payload.get("value", default)
+
+    def has(self, task: str, stage: str, strategy: str = None) -> bool:
+        return os.path.exists(self._path(task, stage, strategy))
+
+    def save_partial(self, task: str, stage: str, messages: list, strategy: str = None):
+        """Records streamed messages of an unfinished stage so they can be salvaged later."""
+        self._write(self._path(task, f"{stage}.partial", strategy), {"stage": stage, "saved_at": time.time(), "messages": messages})
+
+    def load_partial(self, task: str, stage: str, strategy: str = None) -> list:
+        payload = self._read(self._path(task, f"{stage}.partial", strategy))
+        return payload.get("messages", []) if payload else []
+
+    def last_completed(self, task: str):
+        """Returns the latest stage in STAGES checkpointed under any strategy, or None."""
+        task_dir = self._task_dir(task)
+        if not os.path.isdir(task_dir):
+            return None
+        saved = {name[:-len(".json")].split(".")[-1] for name in os.listdir(task_dir) if name.endswith(".json")}
+        completed = None
+        for stage in STAGES:
+            if stage in saved:
+                completed = stage
+        return completed
+
+    def discard(self, task: str, stage: str, strategy: str = None):
+        """Removes a stage's checkpoint and any partial output so the next run recomputes it."""
+        for path in (self._path(task, stage, strategy), self._path(task, f"{stage}.partial", strategy)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def clear(self, task: str):
+        """Removes every checkpoint of a task."""
+        shutil.rmtree(self._task_dir(task), ignore_errors=True)
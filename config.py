@@ -34,8 +34,13 @@ def create_model_info(model_name):
     )
 
 # Function to create a model client for a specific model
-def make_llm_config(model_name):
-    """Creates a model client for AutoGen v6.0 using OpenRouter (OpenAI-compatible API)."""
+def make_llm_config(model_name, json_output=False):
+    """Creates a model client for AutoGen v6.0 using OpenRouter (OpenAI-compatible API).
+
+    With json_output the client requests JSON-object responses; replies still arrive as raw text
+    so malformed output can be repaired locally instead of failing inside the agent.
+    """
+    extra_args = {"response_format": {"type": "json_object"}} if json_output else {}
     return OpenAIChatCompletionClient(
         model=model_name,
         api_key=OPENROUTER_KEY,
@@ -43,5 +48,6 @@ def make_llm_config(model_name):
         model_info=create_model_info(model_name),
         timeout=120,
         temperature=0.7,
-        max_tokens=4096
+        max_tokens=4096,
+        **extra_args
     )
\ No newline at end of file
@@ -0,0 +1,434 @@
+# distributed.py
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import argparse
+import threading
+from contextlib import contextmanager
+
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+class LeaseLost(Exception):
+    """Raised inside a worker when its lease expired and the job was handed to someone else."""
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class SQLiteJobQueue:
+    """Job queue in a local SQLite file; SQLite's file locks serialize claims between processes.
+
+    Only suitable for workers on the same machine (or a filesystem with reliable locking).
+    """
+
+    def __init__(self, path: str = "jobs.db", lease_seconds: int = DEFAULT_LEASE_SECONDS, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    batch TEXT NOT NULL,
+                    task TEXT NOT NULL,
+                    strategy TEXT,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    worker TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_batch ON jobs (batch)")
+
+    @contextmanager
+    def _connect(self, immediate: bool = False):
+        """Yields an autocommit connection, optionally inside a write-locked transaction."""
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            if immediate:
+                conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            if immediate:
+                conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def enqueue(self, batch_id: str, jobs: list) -> list:
+        now = time.time()
+        rows = [(uuid.uuid4().hex, batch_id, job["task"], job.get("strategy"), now, now) for job in jobs]
+        with self._connect(immediate=True) as conn:
+            conn.executemany("INSERT INTO jobs (id, batch, task, strategy, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)", rows)
+        return [row[0] for row in rows]
+
+    def claim(self, worker_id: str):
+        now = time.time()
+        with self._connect(immediate=True) as conn:
+            # Re-deliver jobs whose worker stopped heartbeating
+            conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "error = CASE WHEN attempts >= ? THEN 'Lease expired too many times' ELSE error END, "
+                "worker = NULL, updated_at = ? WHERE status = 'leased' AND lease_expires < ?",
+                (self.max_attempts, self.max_attempts, now, now),
+            )
+            row = conn.execute("SELECT * FROM jobs WHERE status = 'pending' ORDER BY created_at LIMIT 1").fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (worker_id, now + self.lease_seconds, now, row["id"]),
+            )
+        return {"id": row["id"], "batch": row["batch"], "task": row["task"], "strategy": row["strategy"], "attempts": row["attempts"] + 1}
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """Extends the lease; returns False if the worker no longer owns the job."""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (now + self.lease_seconds, now, job_id, worker_id),
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id: str, worker_id: str, result: dict) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, updated_at = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (json.dumps(result, default=str), time.time(), job_id, worker_id),
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        """Returns the job to the queue, or marks it failed once max_attempts is reached."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "worker = NULL, error = ?, updated_at = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (self.max_attempts, error, time.time(), job_id, worker_id),
+            )
+            return cursor.rowcount == 1
+
+    def batch_status(self, batch_id: str) -> dict:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs WHERE batch = ? GROUP BY status", (batch_id,)).fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def results(self, batch_id: str) -> list:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM jobs WHERE batch = ? ORDER BY created_at", (batch_id,)).fetchall()
+        return [
+            {"id": row["id"], "task": row["task"], "status": row["status"], "attempts": row["attempts"],
+             "result": json.loads(row["result"]) if row["result"] else None, "error": row["error"]}
+            for row in rows
+        ]
+
+
+# Lua scripts keep each queue transition atomic on the Redis server. Every key a script touches
+# is passed in KEYS (pending list, leases zset, job hash), as Redis Cluster and strict servers require.
+_REDIS_REAP = """
+local id, now = ARGV[1], ARGV[2]
+local expires = redis.call('ZSCORE', KEYS[2], id)
+if not expires or tonumber(expires) > tonumber(now) then return 0 end
+redis.call('ZREM', KEYS[2], id)
+if tonumber(redis.call('HGET', KEYS[3], 'attempts') or '0') >= tonumber(ARGV[3]) then
+    redis.call('HSET', KEYS[3], 'status', 'failed', 'error', 'Lease expired too many times', 'updated_at', now)
+else
+    redis.call('HSET', KEYS[3], 'status', 'pending', 'updated_at', now)
+    redis.call('RPUSH', KEYS[1], id)
+end
+return 1
+"""
+
+_REDIS_CLAIM = """
+local id = ARGV[1]
+if redis.call('LINDEX', KEYS[1], 0) ~= id then return 0 end
+redis.call('LPOP', KEYS[1])
+redis.call('HSET', KEYS[3], 'status', 'leased', 'worker', ARGV[4], 'lease_expires', ARGV[3], 'updated_at', ARGV[2])
+redis.call('HINCRBY', KEYS[3], 'attempts', 1)
+redis.call('ZADD', KEYS[2], ARGV[3], id)
+return 1
+"""
+
+_REDIS_HEARTBEAT = """
+if redis.call('HGET', KEYS[2], 'worker') ~= ARGV[2] or redis.call('HGET', KEYS[2], 'status') ~= 'leased' then return 0 end
+redis.call('HSET', KEYS[2], 'lease_expires', ARGV[3])
+redis.call('ZADD', KEYS[1], ARGV[3], ARGV[1])
+return 1
+"""
+
+_REDIS_FINISH = """
+local key = KEYS[3]
+if redis.call('HGET', key, 'worker') ~= ARGV[2] or redis.call('HGET', key, 'status') ~= 'leased' then return 0 end
+redis.call('ZREM', KEYS[2], ARGV[1])
+local status = ARGV[3]
+if status == 'retry' then
+    if tonumber(redis.call('HGET', key, 'attempts') or '0') >= tonumber(ARGV[5]) then
+        status = 'failed'
+    else
+        status = 'pending'
+        redis.call('RPUSH', KEYS[1], ARGV[1])
+    end
+    redis.call('HSET', key, 'status', status, 'worker', '', 'error', ARGV[4])
+else
+    redis.call('HSET', key, 'status', status, 'result', ARGV[4])
+end
+return 1
+"""
+
+
+class RedisJobQueue:
+    """Job queue on a Redis-compatible server, for workers spread over many machines.
+
+    Keys share a `{prefix}` hash tag and every script declares the keys it touches, so the
+    scripts also work against Redis Cluster. Claiming reads the head of the pending list and
+    then leases it only if it is still the head, retrying if another worker took it first.
+    """
+
+    def __init__(self, url: str, lease_seconds: int = DEFAULT_LEASE_SECONDS, max_attempts: int = DEFAULT_MAX_ATTEMPTS, prefix: str = "codegen"):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("The Redis queue backend requires the 'redis' package (pip install redis).")
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.prefix = f"{{{prefix}}}:"
+        self.pending_key = f"{self.prefix}pending"
+        self.leases_key = f"{self.prefix}leases"
+        self._reap = self.client.register_script(_REDIS_REAP)
+        self._claim = self.client.register_script(_REDIS_CLAIM)
+        self._heartbeat = self.client.register_script(_REDIS_HEARTBEAT)
+        self._finish = self.client.register_script(_REDIS_FINISH)
+
+    def _job_key(self, job_id: str) -> str:
+        return f"{self.prefix}job:{job_id}"
+
+    def _script_keys(self, job_id: str) -> list:
+        return [self.pending_key, self.leases_key, self._job_key(job_id)]
+
+    def enqueue(self, batch_id: str, jobs: list) -> list:
+        now = time.time()
+        ids = []
+        pipe = self.client.pipeline()
+        for job in jobs:
+            job_id = uuid.uuid4().hex
+            ids.append(job_id)
+            pipe.hset(self._job_key(job_id), mapping={
+                "id": job_id, "batch": batch_id, "task": job["task"], "strategy": job.get("strategy") or "",
+                "status": "pending", "attempts": 0, "created_at": now, "updated_at": now,
+            })
+            pipe.rpush(f"{self.prefix}batch:{batch_id}", job_id)
+            pipe.rpush(self.pending_key, job_id)
+        pipe.execute()
+        return ids
+
+    def claim(self, worker_id: str):
+        now = time.time()
+        # Requeue (or fail) jobs whose lease expired
+        for expired_id in self.client.zrangebyscore(self.leases_key, "-inf", now):
+            self._reap(keys=self._script_keys(expired_id), args=[expired_id, now, self.max_attempts])
+        while True:
+            job_id = self.client.lindex(self.pending_key, 0)
+            if job_id is None:
+                return None
+            if self._claim(keys=self._script_keys(job_id), args=[job_id, now, now + self.lease_seconds, worker_id]):
+                break
+        job = self.client.hgetall(self._job_key(job_id))
+        return {"id": job_id, "batch": job["batch"], "task": job["task"], "strategy": job.get("strategy") or None, "attempts": int(job["attempts"])}
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        return bool(self._heartbeat(keys=[self.leases_key, self._job_key(job_id)], args=[job_id, worker_id, time.time() + self.lease_seconds]))
+
+    def complete(self, job_id: str, worker_id: str, result: dict) -> bool:
+        return bool(self._finish(
+            keys=self._script_keys(job_id),
+            args=[job_id, worker_id, "done", json.dumps(result, default=str), self.max_attempts],
+        ))
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        return bool(self._finish(
+            keys=self._script_keys(job_id),
+            args=[job_id, worker_id, "retry", error, self.max_attempts],
+        ))
+
+    def _batch_jobs(self, batch_id: str) -> list:
+        pipe = self.client.pipeline()
+        for job_id in self.client.lrange(f"{self.prefix}batch:{batch_id}", 0, -1):
+            pipe.hgetall(self._job_key(job_id))
+        return pipe.execute()
+
+    def batch_status(self, batch_id: str) -> dict:
+        counts = {}
+        for job in self._batch_jobs(batch_id):
+            status = job.get("status", "pending")
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+
+    def results(self, batch_id: str) -> list:
+        return [
+            {"id": job["id"], "task": job["task"], "status": job["status"], "attempts": int(job.get("attempts", 0)),
+             "result": json.loads(job["result"]) if job.get("result") else None, "error": job.get("error") or None}
+            for job in self._batch_jobs(batch_id)
+        ]
+
+
+def open_queue(url: str, lease_seconds: int = DEFAULT_LEASE_SECONDS, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+    """Opens a queue from a URL: sqlite:///path/to/jobs.db or redis://host:port/db."""
+    if url.startswith("sqlite:///"):
+        return SQLiteJobQueue(url[len("sqlite:///"):], lease_seconds, max_attempts)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisJobQueue(url, lease_seconds, max_attempts)
+    raise ValueError(f"Unsupported queue URL: {url}")
+
+
+def load_tasks(path: str) -> list:
+    """Reads a batch file: one task per line, either plain text or JSON with 'task' and optional 'strategy'."""
+    jobs = []
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                job = json.loads(line)
+                jobs.append({"task": job["task"], "strategy": job.get("strategy")})
+            else:
+                jobs.append({"task": line, "strategy": None})
+    return jobs
+
+
+def run_coordinator(job_queue, jobs: list, wait: bool = True, poll_interval: float = 5.0, output: str = None) -> str:
+    """Splits a task batch into queued jobs and optionally waits for workers to finish them."""
+    batch_id = uuid.uuid4().hex[:12]
+    job_queue.enqueue(batch_id, jobs)
+    print(f"📦 Batch {batch_id}: queued {len(jobs)} jobs")
+    if not wait:
+        return batch_id
+
+    while True:
+        counts = job_queue.batch_status(batch_id)
+        done = counts.get("done", 0) + counts.get("failed", 0)
+        print(f"⏳ Batch {batch_id}: {done}/{len(jobs)} finished {counts}")
+        if done >= len(jobs):
+            break
+        time.sleep(poll_interval)
+
+    if output:
+        with open(output, "w") as f:
+            for record in job_queue.results(batch_id):
+                f.write(json.dumps(record, default=str) + "\n")
+        print(f"💾 Results written to {output}")
+    return batch_id
+
+
+def run_worker(job_queue, worker_id: str = None, poll_interval: float = 2.0, max_idle: float = None):
+    """Claims jobs until stopped (or idle for max_idle seconds), heartbeating while each one runs."""
+    # Imported here so coordinators and status queries do not need model credentials
+    from agents import create_all_agents, reset_agents
+    from checkpoint import CheckpointStore
+    from main import solve_task
+    from runstore import RunStore
+    from schemas import STRATEGIES
+
+    worker_id = worker_id or default_worker_id()
+    # No user proxy: a headless worker must never wait on stdin
+    agents = create_all_agents(interactive=False)
+    checkpoints = CheckpointStore()
+    run_store = RunStore()
+    print(f"👷 Worker {worker_id} started")
+
+    idle_since = time.time()
+    while True:
+        job = job_queue.claim(worker_id)
+        if job is None:
+            if max_idle is not None and time.time() - idle_since > max_idle:
+                print(f"👋 Worker {worker_id} idle for {max_idle}s, exiting")
+                run_store.close()
+                return
+            time.sleep(poll_interval)
+            continue
+
+        print(f"\n🎯 Job {job['id']} (attempt {job['attempts']}): {job['task'][:80]}")
+        lease_lost = threading.Event()
+        stop_heartbeat = threading.Event()
+
+        def keep_alive():
+            while not stop_heartbeat.wait(job_queue.lease_seconds / 3):
+                if not job_queue.heartbeat(job["id"], worker_id):
+                    lease_lost.set()
+                    return
+
+        heartbeat = threading.Thread(target=keep_alive, daemon=True)
+        heartbeat.start()
+
+        def on_stage(stage, data):
+            if lease_lost.is_set():
+                raise LeaseLost(job["id"])
+
+        strategy = job["strategy"] if job["strategy"] in STRATEGIES else None
+        choose_strategy = (lambda recommended: strategy) if strategy else None
+        try:
+            # Start every job from a clean conversation context; model clients stay warm
+            reset_agents(agents)
+            result = solve_task(job["task"], agents, checkpoints, choose_strategy=choose_strategy, on_stage=on_stage, run_store=run_store)
+            if job_queue.complete(job["id"], worker_id, result):
+                print(f"✅ Job {job['id']} done")
+            else:
+                print(f"⚠️ Lost lease on job {job['id']} before completing it, result dropped")
+        except LeaseLost:
+            print(f"⚠️ Lost lease on job {job['id']}, abandoning it")
+        except Exception as e:
+            print(f"❌ Job {job['id']} failed: {e}")
+            job_queue.fail(job["id"], worker_id, str(e))
+        finally:
+            stop_heartbeat.set()
+            heartbeat.join()
+            run_store.flush()
+        idle_since = time.time()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distribute task batches over a shared job queue.")
+    parser.add_argument("--queue", default=os.getenv("JOB_QUEUE_URL", "sqlite:///jobs.db"), help="sqlite:///path or redis://host:port/db")
+    parser.add_argument("--lease-seconds", type=int, default=DEFAULT_LEASE_SECONDS)
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    coordinator = commands.add_parser("coordinator", help="Queue a batch of tasks and wait for results")
+    coordinator.add_argument("tasks", help="File with one task per line (text or JSON)")
+    coordinator.add_argument("--out", help="Write results as JSON lines to this file")
+    coordinator.add_argument("--no-wait", action="store_true")
+
+    worker = commands.add_parser("worker", help="Claim and run jobs")
+    worker.add_argument("--id")
+    worker.add_argument("--max-idle", type=float)
+
+    status = commands.add_parser("status", help="Show job counts for a batch")
+    status.add_argument("batch")
+
+    args = parser.parse_args()
+    job_queue = open_queue(args.queue, args.lease_seconds, args.max_attempts)
+    try:
+        if args.command == "coordinator":
+            run_coordinator(job_queue, load_tasks(args.tasks), wait=not args.no_wait, output=args.out)
+        elif args.command == "worker":
+            run_worker(job_queue, args.id, max_idle=args.max_idle)
+        else:
+            print(json.dumps(job_queue.batch_status(args.batch)))
+    except KeyboardInterrupt:
+        print("\n\n👋 Process interrupted by user.")
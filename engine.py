@@ -1,10 +1,10 @@
 # engine.py
-import json
 import re
 import asyncio
-import re
-import json
-from utils import CodeExtractor, extract_json_from_response, run_agent_task,safe_initiate_chat
+from utils import CodeExtractor, run_agent_task, safe_initiate_chat_sync
+from checkpoint import is_usable
+from search import ANALYZER_SEARCH, research_summary
+from schemas import Critique, TaskAnalysis, parse_structured
 from autogen_agentchat.teams import DiGraphBuilder, GraphFlow
 from autogen_agentchat.messages import TextMessage
 
@@ -12,14 +12,44 @@ from autogen_agentchat.messages import TextMessage
 
 
 class ReasoningPipelines:
-    def __init__(self, agents):
+    def __init__(self, agents, checkpoints=None):
         self.agents = agents
         self.user_proxy = agents["user_proxy"]
+        self.checkpoints = checkpoints
+
+    def _checkpointed(self, task: str, stage: str, strategy: str, produce):
+        """Returns the checkpointed value for a stage, or produces and records it."""
+        if self.checkpoints:
+            cached = self.checkpoints.load(task, stage, strategy)
+            if is_usable(cached):
+                print(f"♻️ Resuming [{strategy}] from checkpoint: {stage}")
+                return cached
+        value = produce()
+        if self.checkpoints and is_usable(value):
+            self.checkpoints.save(task, stage, value, strategy)
+        return value
+
+    @staticmethod
+    def _salvage_code(messages: list) -> str:
+        """Extracts the most recent ```python fenced block from partially streamed messages.
+
+        Unlike CodeExtractor, never falls back to the whole message: unfenced text is not code.
+        """
+        for msg in reversed(messages):
+            match = re.search(r'```python\n(.*?)\n```', msg, re.DOTALL)
+            if match and len(match.group(1).strip()) > 10:
+                return match.group(1).strip()
+        return ""
 
-    
 
     def code_first_pipeline(self, task: str) -> str:
         print("\n🚀 Running [Code-First] Pipeline with GraphFlow...")
+
+        if self.checkpoints:
+            cached = self.checkpoints.load(task, "candidate_code", "CODE_FIRST")
+            if is_usable(cached):
+                print("♻️ Resuming [CODE_FIRST] from checkpoint: candidate_code")
+                return cached
         
         def build_flow():
             builder = DiGraphBuilder()
@@ -38,18 +68,25 @@ class ReasoningPipelines:
         
         current_solution = None
         
-        async def run_flow_capture_code():
+        def record_partial(all_messages):
+            if self.checkpoints:
+                self.checkpoints.save_partial(task, "candidate_code", all_messages, "CODE_FIRST")
+
+        async def run_flow_capture_code(all_messages):
             final_code = ""
-            all_messages = []
             flow = build_flow()
             
             try:
                 async for event in flow.run_stream(task=system_prompt):
                     print(f"🔄 Event type: {type(event).__name__}")
+                    if getattr(event, "source", None) == "user":
+                        # The echoed task prompt is not agent output; never record or salvage it
+                        continue
                     
                     if isinstance(event, TextMessage):
                         content = event.content
                         all_messages.append(content)
+                        record_partial(all_messages)
                         print(f"📝 Message: {content[:100]}...")
                         
                         if "```python" in content or "```" in content:
@@ -62,6 +99,7 @@ class ReasoningPipelines:
                     elif hasattr(event, 'content') and event.content:
                         content = str(event.content)
                         all_messages.append(content)
+                        record_partial(all_messages)
                         if "```python" in content or "```" in content:
                             extracted = CodeExtractor.extract_python_code(content)
                             if extracted and len(extracted) > 10:
@@ -70,12 +108,7 @@ class ReasoningPipelines:
             except Exception as e:
                 print(f"Flow execution error: {e}")
                 # Try to extract code from any collected messages
-                for msg in all_messages:
-                    if "```" in msg:
-                        extracted = CodeExtractor.extract_python_code(msg)
-                        if extracted and len(extracted) > 10:
-                            final_code = extracted
-                            break
+                final_code = self._salvage_code(all_messages)
             
             # If no code found, try the last substantial message
             if not final_code and all_messages:
@@ -90,18 +123,30 @@ class ReasoningPipelines:
             
             return final_code
         
+        # Output streamed by an interrupted earlier run is reused before asking the flow again
+        salvaged = self._salvage_code(self.checkpoints.load_partial(task, "candidate_code", "CODE_FIRST")) if self.checkpoints else ""
+
         for attempt in range(3):
             print(f"\n🔁 Attempt {attempt + 1}")
+            all_messages = []
             
             try:
-                # Add timeout to prevent hanging
-                current_solution = asyncio.run(
-                    asyncio.wait_for(run_flow_capture_code(), timeout=120.0)
-                )
+                if salvaged:
+                    print("♻️ Salvaged code from interrupted run")
+                    current_solution, salvaged = salvaged, ""
+                else:
+                    # Add timeout to prevent hanging
+                    current_solution = asyncio.run(
+                        asyncio.wait_for(run_flow_capture_code(all_messages), timeout=120.0)
+                    )
                 
             except asyncio.TimeoutError:
                 print(f"⏰ Timeout in attempt {attempt + 1}")
-                continue
+                partial_code = self._salvage_code(all_messages)
+                if not partial_code:
+                    continue
+                print("♻️ Salvaged partial output from timed-out attempt")
+                current_solution = partial_code
             except Exception as e:
                 print(f"Error in attempt {attempt + 1}: {e}")
                 if "RateLimitError" in str(e) or "429" in str(e):
@@ -132,40 +177,40 @@ class ReasoningPipelines:
             try:
                 # Use the utils function - this returns a string, not a coroutine
                 critique_response = run_agent_task(
-                    self.agents["reasoner"], 
+                    self.agents["reviewer"], 
                     critique_prompt, 
                     self.user_proxy,
                     max_turns=2
                 )
                 
-                print(f"🧠 Critique response: {critique_response[:200]}...")
+                print(f"🧠 Critique response: {str(critique_response)[:200]}...")
                 
-                # Extract JSON from response using utils
-                json_str = extract_json_from_response(critique_response)
+                # Validate (and locally repair) the structured critique
+                critique = parse_structured(critique_response, Critique)
                 
-                try:
-                    critique = json.loads(json_str)
-                    score = critique.get("score", 0)
+                if critique is None:
+                    print("\n⚠️ Could not parse critique")
+                    print(f"Raw response: {critique_response}")
+                    # Continue to next attempt
+                else:
+                    score = critique.score
                     print(f"\n🧠 Score: {score}/10")
                     
                     if score >= 8:
                         print(f"\n✅ Final score {score}/10 — Code accepted.")
+                        if self.checkpoints and is_usable(current_solution):
+                            self.checkpoints.save(task, "candidate_code", current_solution, "CODE_FIRST")
                         return current_solution
                     
                     print("\n🛠️ Retrying refinement...")
                     # Update the system prompt with feedback for next iteration
-                    issues = critique.get("issues", [])
-                    fixes = critique.get("fixes", [])
+                    issues = critique.issues
+                    fixes = critique.fixes
                     if issues or fixes:
                         feedback = f"\nPrevious issues: {issues}\nSuggested fixes: {fixes}"
                         system_prompt = f"""{system_prompt}\n{feedback}
                         
                         Please improve the code based on the feedback above."""
-                        
-                except json.JSONDecodeError as e:
-                    print(f"\n⚠️ JSON parsing error: {e}")
-                    print(f"Raw response: {json_str}")
-                    # Continue to next attempt
                     
             except Exception as e:
                 print(f"\n⚠️ Critique generation failed: {e}")
@@ -174,6 +219,7 @@ class ReasoningPipelines:
                     break
                 # Continue to next attempt
         
+        # Not checkpointed: code the reviewer never accepted should be regenerated on the next run
         print("\n❌ Max retries reached. Returning last version.")
         return current_solution or "# No code returned."
     def pseudocode_first_pipeline(self, task: str) -> str:
@@ -183,9 +229,19 @@ Wrap in ```pseudocode ... ```.
 
 Task: {task}
 """
-        pseudocode_plan = safe_initiate_chat(self.agents["reasoner"], plan_prompt, self.user_proxy)
-        refined_plan = self._collaborative_reasoning(task, pseudocode_plan)
-        return self._implement_with_loop(task, refined_plan)
+        strategy = "PSEUDOCODE_FIRST"
+        pseudocode_plan = self._checkpointed(
+            task, "plan", strategy,
+            lambda: safe_initiate_chat_sync(self.agents["reasoner"], plan_prompt, self.user_proxy)
+        )
+        refined_plan = self._checkpointed(
+            task, "refined_plan", strategy,
+            lambda: self._collaborative_reasoning(task, pseudocode_plan)
+        )
+        return self._checkpointed(
+            task, "candidate_code", strategy,
+            lambda: self._implement_with_loop(task, refined_plan)
+        )
 
     def neuro_symbolic_pipeline(self, task: str) -> str:
         print("\n🚀 Running [Neuro-Symbolic] Pipeline...")
@@ -197,14 +253,25 @@ Task: {task}
 
 Task: {task}
 """
-        logic_analysis = safe_initiate_chat(self.agents["logical_reasoner"], decomp_prompt, self.user_proxy)
+        strategy = "NEURO_SYMBOLIC"
+
+        def build_symbolic_plan():
+            logic_analysis = safe_initiate_chat_sync(self.agents["logical_reasoner"], decomp_prompt, self.user_proxy)
 
-        symbolic_prompt = f"""Based on this analysis, generate symbolic representation and pseudocode.
+            symbolic_prompt = f"""Based on this analysis, generate symbolic representation and pseudocode.
 Analysis: {logic_analysis}
 """
-        symbolic_plan = safe_initiate_chat(self.agents["symbolic_reasoner"], symbolic_prompt, self.user_proxy)
-        refined_plan = self._collaborative_reasoning(task, symbolic_plan)
-        return self._implement_with_loop(task, refined_plan)
+            return safe_initiate_chat_sync(self.agents["symbolic_reasoner"], symbolic_prompt, self.user_proxy)
+
+        symbolic_plan = self._checkpointed(task, "plan", strategy, build_symbolic_plan)
+        refined_plan = self._checkpointed(
+            task, "refined_plan", strategy,
+            lambda: self._collaborative_reasoning(task, symbolic_plan)
+        )
+        return self._checkpointed(
+            task, "candidate_code", strategy,
+            lambda: self._implement_with_loop(task, refined_plan)
+        )
 
     def _collaborative_reasoning(self, task: str, initial_plan: str) -> str:
         current_plan = initial_plan
@@ -214,9 +281,9 @@ Analysis: {logic_analysis}
 Task: {task}
 Plan: {current_plan}
 """
-            detailed = safe_initiate_chat(self.agents["reasoner"], analysis_prompt, self.user_proxy)
+            detailed = safe_initiate_chat_sync(self.agents["reasoner"], analysis_prompt, self.user_proxy)
 
-            quick = safe_initiate_chat(
+            quick = safe_initiate_chat_sync(
                 self.agents["quick_reasoner"],
                 f"What's the biggest flaw and quick fix in this plan?\n{current_plan}",
                 self.user_proxy
@@ -228,7 +295,7 @@ Task: {task}
 Detailed Analysis: {detailed}
 Quick Feedback: {quick}
 """
-            current_plan = safe_initiate_chat(self.agents["reasoner"], merge_prompt, self.user_proxy)
+            current_plan = safe_initiate_chat_sync(self.agents["reasoner"], merge_prompt, self.user_proxy)
         return current_plan
 
     def _implement_with_loop(self, task: str, plan: str) -> str:
@@ -237,7 +304,7 @@ Plan:
 {plan}
 Return only the code in ```python ... ``` block.
 """
-        current_code = safe_initiate_chat(self.agents["codegen"], impl_prompt, self.user_proxy)
+        current_code = safe_initiate_chat_sync(self.agents["codegen"], impl_prompt, self.user_proxy)
 
         for attempt in range(3):
             critique_prompt = f"""Critique this code implementation. Return JSON: 
@@ -248,15 +315,15 @@ Plan: {plan}
 Code:
 {current_code}
 """
-            critique_response = safe_initiate_chat(self.agents["reasoner"], critique_prompt, self.user_proxy)
+            critique_response = safe_initiate_chat_sync(self.agents["reviewer"], critique_prompt, self.user_proxy)
 
             try:
-                match = re.search(r'\{.*\}', critique_response, re.DOTALL)
-                critique = json.loads(match.group()) if match else {}
-                score = critique.get("score", 0)
+                critique = parse_structured(critique_response, Critique)
+                if critique is None:
+                    raise ValueError("Unparseable critique")
 
-                if score >= 8:
-                    print(f"✅ Final implementation score {score}/10")
+                if critique.score >= 8:
+                    print(f"✅ Final implementation score {critique.score}/10")
                     return current_code
 
                 correction_prompt = f"""Fix the code based on issues and improvements suggested.
@@ -265,25 +332,44 @@ Plan:
 {plan}
 Code:
 {current_code}
-Issues: {critique.get('issues', [])}
-Fixes: {critique.get('fixes', [])}
+Issues: {critique.issues}
+Fixes: {critique.fixes}
 Return only the corrected code.
 """
-                current_code = safe_initiate_chat(self.agents["corrector"], correction_prompt, self.user_proxy)
+                current_code = safe_initiate_chat_sync(self.agents["corrector"], correction_prompt, self.user_proxy)
 
             except Exception:
                 fallback = f"Improve the following code for task: {task}\nCode: {current_code}"
-                current_code = safe_initiate_chat(self.agents["corrector"], fallback, self.user_proxy)
+                current_code = safe_initiate_chat_sync(self.agents["corrector"], fallback, self.user_proxy)
 
         return current_code
 
 
 class LLMTaskAnalyzer:
-    def __init__(self, agents):
+    def __init__(self, agents, checkpoints=None, search=None, use_search: bool = ANALYZER_SEARCH):
         self.agent = agents["task_analyzer"]
         self.user_proxy = agents["user_proxy"]
+        self.checkpoints = checkpoints
+        self.search = search
+        self.use_search = use_search
+
+    def research(self, task: str) -> str:
+        """Compact web search summary for the analyzer prompt; "" when disabled or nothing was found."""
+        if not self.use_search:
+            return ""
+        topic = " ".join(task.split())[:120]
+        try:
+            return research_summary([topic, f"python {topic}"], search=self.search)
+        except Exception as e:
+            print(f"⚠️ Web search failed, analyzing without it: {e}")
+            return ""
 
     def analyze_task(self, task: str) -> dict:
+        if self.checkpoints:
+            cached = self.checkpoints.load(task, "analysis")
+            if cached:
+                print("♻️ Resuming from checkpoint: analysis")
+                return cached
         prompt = f"""Analyze this task and recommend one reasoning strategy: 
 CODE_FIRST | PSEUDOCODE_FIRST | NEURO_SYMBOLIC. Return JSON:
 {{
@@ -294,9 +380,19 @@ CODE_FIRST | PSEUDOCODE_FIRST | NEURO_SYMBOLIC. Return JSON:
 
 Task: {task}
 """
+        research = self.research(task)
+        if research:
+            prompt += f"\nBackground from web search:\n{research}\n"
+        fallback = {"reasoning_strategy": "CODE_FIRST", "complexity": 3, "explanation": "Default fallback"}
         try:
-            response = safe_initiate_chat(self.agent, prompt, self.user_proxy)
-            match = re.search(r'\{.*\}', response, re.DOTALL)
-            return json.loads(match.group()) if match else {}
+            response = safe_initiate_chat_sync(self.agent, prompt, self.user_proxy)
+            parsed = parse_structured(response, TaskAnalysis)
+            if parsed is None:
+                print("⚠️ Could not parse task analysis, using default strategy")
+                return fallback
+            analysis = parsed.model_dump()
+            if self.checkpoints:
+                self.checkpoints.save(task, "analysis", analysis)
+            return analysis
         except Exception:
-            return {"reasoning_strategy": "CODE_FIRST", "complexity": 3, "explanation": "Default fallback"}
+            return fallback
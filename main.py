@@ -2,9 +2,13 @@
 import json
 import time
 from agents import create_all_agents
+from checkpoint import CheckpointStore, task_hash
+from config import FREE_MODELS
+from runstore import RunStore, token_usage
+from schemas import STRATEGIES, TestSuite, parse_structured
 from engine import LLMTaskAnalyzer, ReasoningPipelines
-from tools import PythonCodeRunner, web_search
-from utils import CodeExtractor, extract_json_from_response, print_test_results, safe_initiate_chat_sync, run_agent_task
+from tools import EXECUTION_CACHE, PythonCodeRunner
+from utils import CodeExtractor, extract_json_from_response, format_test_results, print_test_results, safe_initiate_chat_sync, run_agent_task
 
 def get_user_choice(recommended_strategy: str) -> str:
     print("\n🤔 CHOOSE A REASONING STRATEGY")
@@ -28,22 +32,34 @@ def get_user_choice(recommended_strategy: str) -> str:
             return strategy_map[choice]
         print("Invalid choice. Please enter 1, 2, or 3.")
 
-def generate_and_run_tests(task: str, code: str, agents: dict) -> tuple[bool, str]:
+def parse_test_cases(tc_response) -> list:
+    """Returns the test writer's cases as a list of {'input', 'expected'} dicts (empty if unparseable)."""
+    suite = parse_structured(tc_response, TestSuite)
+    return [case.model_dump() for case in suite.test_cases] if suite else []
+
+def generate_and_run_tests(task: str, code: str, agents: dict, checkpoints: CheckpointStore = None) -> tuple[bool, str, list]:
     print("\n🧪 GENERATING AND RUNNING TESTS...")
     user_proxy = agents["user_proxy"]
 
-    tc_prompt = f"""Generate comprehensive test cases for this task.
-Return a JSON array of test cases with 'input' and 'expected' fields.
+    test_cases = checkpoints.load(task, "test_cases") if checkpoints else None
+    if test_cases:
+        print("♻️ Resuming from checkpoint: test_cases")
+    else:
+        tc_prompt = f"""Generate comprehensive test cases for this task.
+Return a JSON object {{"test_cases": [...]}} where each test case has 'input' and 'expected' fields.
 Include edge cases and typical scenarios.
 
 Task: {task}
 """
-    tc_response = safe_initiate_chat_sync(agents["testwriter"], tc_prompt, user_proxy)
-    test_cases_str = extract_json_from_response(tc_response)
+        tc_response = safe_initiate_chat_sync(agents["testwriter"], tc_prompt, user_proxy)
+        test_cases = parse_test_cases(tc_response)
+
+        if not test_cases:
+            print("⚠️ Could not generate test cases, skipping verification")
+            return True, code, []
 
-    if not test_cases_str:
-        print("⚠️ Could not generate test cases, skipping verification")
-        return True, code
+        if checkpoints:
+            checkpoints.save(task, "test_cases", test_cases)
     
     print(f"📋 Test cases generated.")
     
@@ -53,15 +69,17 @@ Task: {task}
 
     if not python_code.strip():
         print("❌ No valid Python code found")
-        return False, code
+        return False, code, []
 
-    results = code_runner.run_code_with_tests(python_code, test_cases_str)
+    results = code_runner.run_code_with_tests(python_code, test_cases)
     success = print_test_results(results)
-    return success, python_code
+    return success, python_code, results
 
-def final_correction_loop(task: str, initial_code: str, test_results: str, agents: dict) -> str:
+def final_correction_loop(task: str, initial_code: str, test_results: str, agents: dict, test_cases: list = None) -> tuple[str, bool, list]:
+    """Returns (code, passed, results) where results are the test results of the returned code."""
     print("\n🔧 FINAL CORRECTION LOOP...")
     current_code = initial_code
+    current_results = []
     user_proxy = agents["user_proxy"]
 
     for attempt in range(3):
@@ -83,55 +101,80 @@ Test Results: {test_results}
             continue
 
         code_runner = PythonCodeRunner()
-        test_cases_str = extract_json_from_response(test_results)
-        if test_cases_str:
-            results = code_runner.run_code_with_tests(corrected_code, test_cases_str)
+        if test_cases is None:
+            test_cases = extract_json_from_response(test_results)
+        if test_cases:
+            results = code_runner.run_code_with_tests(corrected_code, test_cases)
             if print_test_results(results):
                 print("✅ Correction successful!")
-                return corrected_code
+                return corrected_code, True, results
+            test_results = format_test_results(results)
+            current_results = results
 
         current_code = corrected_code
 
     print("⚠️ Could not fully correct the code after 3 attempts")
-    return current_code
+    return current_code, False, current_results
 
-def main():
-    print("🚀 LLM-DRIVEN MULTI-STRATEGY CODE GENERATION SYSTEM 🚀")
-    print("=" * 70)
+def solve_task(task: str, agents: dict, checkpoints: CheckpointStore = None, choose_strategy=None, on_stage=None, run_store: RunStore = None) -> dict:
+    """Runs analysis, the selected pipeline and verification for one task.
 
-    task = input("📝 Enter your programming task (or press Enter for default): ").strip()
-    if not task:
-        task = "Create a Python function that finds the longest palindromic substring in a given string."
+    `choose_strategy` maps the recommended strategy to the one to run (defaults to the recommendation).
+    `on_stage(stage, data)` is called as each stage completes; raising from it aborts the run.
+    The returned run record (stages, candidates, test results, timings, tokens) is queued to `run_store`.
+    `test_success` and `score` describe `final_code`; `verified` is False when no tests could be run.
+    Time spent inside `choose_strategy` (e.g. waiting on the user) is excluded from latencies.
+    """
+    user_proxy = agents["user_proxy"]
+    started_at = time.time()
+    usage_before = token_usage(agents)
+    stages = []
+    user_wait = 0.0
 
-    print(f"\n🎯 Task: {task}")
-    print("=" * 70)
+    def notify(stage, data, excluded: float = 0.0):
+        now = time.time()
+        previous = stages[-1]["finished_at"] if stages else started_at
+        stages.append({"stage": stage, "value": data, "latency": now - previous - excluded, "finished_at": now})
+        if on_stage:
+            on_stage(stage, data)
 
-    print("🔧 Setting up agents and tools...")
-    agents = create_all_agents()
-    user_proxy = agents["user_proxy"]
-    
-    # Note: Function registration might work differently in v6.0
-    # This may need adjustment based on your specific v6.0 setup
-    try:
-        user_proxy.register_function(function_map={"web_search": web_search})
-    except AttributeError:
-        print("⚠️ Function registration method may need adjustment for v6.0")
+    def finish(result):
+        usage_after = token_usage(agents)
+        results = [r for r in result["test_results"] if isinstance(r, dict)]
+        result.update(
+            stages=stages,
+            score=sum(1 for r in results if r.get("passed")) / len(results) if results else None,
+            started_at=started_at,
+            finished_at=time.time(),
+            user_wait=user_wait,
+            tokens={key: usage_after[key] - usage_before[key] for key in usage_after},
+        )
+        result["latency"] = result["finished_at"] - started_at - user_wait
+        if run_store:
+            run_store.record_run(result)
+        return result
 
     print("\n1️⃣ ANALYZING TASK COMPLEXITY...")
-    analyzer = LLMTaskAnalyzer(agents)
+    analyzer = LLMTaskAnalyzer(agents, checkpoints)
     analysis = analyzer.analyze_task(task)
 
     print("🧠 Analysis Results:")
     print(f"   - Strategy: {analysis.get('reasoning_strategy', 'N/A')}")
     print(f"   - Complexity: {analysis.get('complexity', 'N/A')}/10")
     print(f"   - Reasoning: {analysis.get('explanation', 'N/A')}")
+    notify("analysis", analysis)
 
-    recommended_strategy = analysis.get("reasoning_strategy", "CODE_FIRST").upper()
-    chosen_strategy = get_user_choice(recommended_strategy)
+    recommended_strategy = str(analysis.get("reasoning_strategy", "CODE_FIRST")).upper()
+    choose_started = time.time()
+    chosen_strategy = choose_strategy(recommended_strategy) if choose_strategy else recommended_strategy
+    user_wait = time.time() - choose_started
+    if chosen_strategy not in STRATEGIES:
+        chosen_strategy = "CODE_FIRST"
     print(f"\n✅ Selected Strategy: [{chosen_strategy}]")
+    notify("strategy", chosen_strategy, excluded=user_wait)
 
     print("\n2️⃣ EXECUTING REASONING PIPELINE...")
-    pipelines = ReasoningPipelines(agents)
+    pipelines = ReasoningPipelines(agents, checkpoints)
 
     pipeline_map = {
         "CODE_FIRST": pipelines.code_first_pipeline,
@@ -141,29 +184,83 @@ def main():
 
     selected_pipeline = pipeline_map[chosen_strategy]
     solution = selected_pipeline(task)
+    result = {
+        "task": task, "strategy": chosen_strategy, "model": FREE_MODELS["coding"], "analysis": analysis,
+        "final_code": "", "test_success": False, "verified": False, "test_results": [], "candidates": [],
+    }
 
     if not solution or solution.strip() == "":
         print("Pipeline failed to generate a solution")
-        return
+        return finish(result)
+    notify("candidate_code", solution)
+    result["candidates"].append({"source": "pipeline", "code": solution})
 
     print("\n3️⃣ TESTING AND VERIFICATION...")
-    test_success, final_code = generate_and_run_tests(task, solution, agents)
+    test_success, final_code, test_results = generate_and_run_tests(task, solution, agents, checkpoints)
+    result["test_results"] = test_results
+    notify("test_results", test_success)
 
     if not test_success:
         print("\n⚠️ Tests failed, attempting final corrections...")
         code_runner = PythonCodeRunner()
         code_extractor = CodeExtractor()
-        tc_response = safe_initiate_chat_sync(agents["testwriter"], f"Generate test cases for: {task}", user_proxy)
-        test_cases_str = extract_json_from_response(tc_response)
+        tc_response = safe_initiate_chat_sync(agents["testwriter"], f"Generate test cases for: {task}\nReturn a JSON object {{\"test_cases\": [...]}} with 'input' and 'expected' fields.", user_proxy)
+        test_cases = parse_test_cases(tc_response)
 
-        if test_cases_str:
-            results = code_runner.run_code_with_tests(final_code, test_cases_str)
-            final_code = final_correction_loop(task, final_code, str(results), agents)
+        if test_cases:
+            results = code_runner.run_code_with_tests(final_code, test_cases)
+            if print_test_results(results):
+                test_success, test_results = True, results
+            else:
+                final_code, test_success, loop_results = final_correction_loop(task, final_code, format_test_results(results), agents, test_cases)
+                # No attempt produced runnable code, so final_code is still the code `results` describe
+                test_results = loop_results or results
+                result["candidates"].append({"source": "correction", "code": final_code})
+        notify("correction", final_code)
+
+    result.update(final_code=final_code, test_success=test_success, verified=bool(test_results), test_results=test_results)
+    if checkpoints:
+        if test_success and test_results:
+            # The run is complete and recorded; a rerun of the task starts fresh
+            checkpoints.clear(task)
+        else:
+            # Keep analysis, plans and test cases, but never resume from code that did not pass
+            checkpoints.discard(task, "candidate_code", chosen_strategy)
+    return finish(result)
+
+def main():
+    print("🚀 LLM-DRIVEN MULTI-STRATEGY CODE GENERATION SYSTEM 🚀")
+    print("=" * 70)
+
+    task = input("📝 Enter your programming task (or press Enter for default): ").strip()
+    if not task:
+        task = "Create a Python function that finds the longest palindromic substring in a given string."
+
+    print(f"\n🎯 Task: {task}")
+    print("=" * 70)
+
+    checkpoints = CheckpointStore()
+    resumed_stage = checkpoints.last_completed(task)
+    if resumed_stage:
+        print(f"♻️ Found checkpoints for task {task_hash(task)} (last completed stage: {resumed_stage})")
+        if input("Resume from them? [Y/n]: ").strip().lower() in ("n", "no"):
+            checkpoints.clear(task)
+            print("🧹 Checkpoints cleared, starting fresh.")
+
+    print("🔧 Setting up agents and tools...")
+    agents = create_all_agents()
+
+    run_store = RunStore()
+    try:
+        result = solve_task(task, agents, checkpoints, choose_strategy=get_user_choice, run_store=run_store)
+    finally:
+        run_store.close()
+    final_code = result["final_code"]
 
     print("\n" + "=" * 70)
     print("🎉 FINAL RESULTS")
     print("=" * 70)
-    print(f"Strategy Used: [{chosen_strategy}]")
+    print(f"Strategy Used: [{result['strategy']}]")
     print(f"Task: {task}")
     print("\n✅ Final Solution:")
     print("-" * 40)
@@ -172,6 +269,8 @@ def main():
     else:
         print("❌ No valid solution was generated")
     print("-" * 40)
+    cache_stats = EXECUTION_CACHE.stats()
+    print(f"🧮 Execution cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses ({cache_stats['hit_rate']:.0%} hit rate)")
 
 if __name__ == "__main__":
     try:
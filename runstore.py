@@ -0,0 +1,286 @@
+# runstore.py
+import os
+import json
+import math
+import time
+import uuid
+import queue
+import sqlite3
+import argparse
+import threading
+from contextlib import closing
+from checkpoint import task_hash
+
+RUNSTORE_PATH = os.getenv("RUNSTORE_PATH", "runs.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id TEXT PRIMARY KEY,
+    task_hash TEXT NOT NULL,
+    task TEXT NOT NULL,
+    strategy TEXT,
+    model TEXT,
+    accepted INTEGER NOT NULL DEFAULT 0,
+    verified INTEGER NOT NULL DEFAULT 0,
+    score REAL,
+    final_code TEXT,
+    analysis TEXT,
+    started_at REAL NOT NULL,
+    finished_at REAL NOT NULL,
+    latency REAL NOT NULL,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_runs_task ON runs (task_hash, finished_at);
+CREATE INDEX IF NOT EXISTS idx_runs_strategy ON runs (strategy, latency);
+CREATE INDEX IF NOT EXISTS idx_runs_model ON runs (model);
+CREATE INDEX IF NOT EXISTS idx_runs_score ON runs (score);
+CREATE INDEX IF NOT EXISTS idx_runs_started ON runs (started_at);
+
+CREATE TABLE IF NOT EXISTS stages (
+    run_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    stage TEXT NOT NULL,
+    value TEXT,
+    latency REAL,
+    PRIMARY KEY (run_id, seq)
+);
+CREATE INDEX IF NOT EXISTS idx_stages_stage ON stages (stage, latency);
+
+CREATE TABLE IF NOT EXISTS candidates (
+    run_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    code TEXT NOT NULL,
+    PRIMARY KEY (run_id, seq)
+);
+
+CREATE TABLE IF NOT EXISTS test_outcomes (
+    run_id TEXT NOT NULL,
+    test_id INTEGER NOT NULL,
+    passed INTEGER NOT NULL,
+    error TEXT,
+    detail TEXT,
+    PRIMARY KEY (run_id, test_id)
+);
+"""
+
+
+def _to_json(value):
+    return value if isinstance(value, str) else json.dumps(value, default=str)
+
+
+def percentile(values: list, p: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class RunStore:
+    """SQLite (WAL) history of pipeline runs with indexed lookups.
+
+    Writes go through `record_run`, which only enqueues; a background thread inserts
+    queued runs in batched transactions so the pipeline never waits on disk.
+    """
+
+    def __init__(self, path: str = RUNSTORE_PATH, batch_size: int = 100, flush_interval: float = 1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="runstore-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def record_run(self, run: dict) -> str:
+        """Queues a finished run (as returned by main.solve_task) for insertion; returns its id."""
+        run = dict(run)
+        run.setdefault("id", uuid.uuid4().hex)
+        self._queue.put(run)
+        return run["id"]
+
+    def flush(self):
+        """Blocks until every queued run has been written."""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._writer.join()
+
+    def _write_loop(self):
+        conn = self._connect()
+        try:
+            while True:
+                batch = [self._queue.get()]
+                deadline = time.time() + self.flush_interval
+                while batch[-1] is not None and len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get(timeout=max(0.0, deadline - time.time())))
+                    except queue.Empty:
+                        break
+                runs = [run for run in batch if run is not None]
+                try:
+                    if runs:
+                        self._insert(conn, runs)
+                except sqlite3.Error as e:
+                    print(f"⚠️ Run store write failed: {e}")
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+                if batch[-1] is None:
+                    return
+        finally:
+            conn.close()
+
+    def _insert(self, conn: sqlite3.Connection, runs: list):
+        run_rows, stage_rows, candidate_rows, outcome_rows = [], [], [], []
+        for run in runs:
+            tokens = run.get("tokens") or {}
+            run_rows.append((
+                run["id"], task_hash(run["task"]), run["task"], run.get("strategy"), run.get("model"),
+                # Accepted means the final code passed tests that actually ran
+                int(bool(run.get("test_success") and run.get("verified"))), int(bool(run.get("verified"))),
+                run.get("score"), run.get("final_code"),
+                _to_json(run.get("analysis") or {}), run["started_at"], run["finished_at"], run["latency"],
+                tokens.get("prompt_tokens"), tokens.get("completion_tokens"),
+            ))
+            for seq, stage in enumerate(run.get("stages", [])):
+                stage_rows.append((run["id"], seq, stage["stage"], _to_json(stage.get("value")), stage.get("latency")))
+            for seq, candidate in enumerate(run.get("candidates", [])):
+                candidate_rows.append((run["id"], seq, candidate["source"], candidate["code"]))
+            for i, outcome in enumerate(run.get("test_results") or []):
+                if not isinstance(outcome, dict):
+                    continue
+                outcome_rows.append((
+                    run["id"], outcome.get("test_id", i), int(bool(outcome.get("passed"))), outcome.get("error"),
+                    _to_json({k: v for k, v in outcome.items() if k not in ("test_id", "passed", "error")}),
+                ))
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO runs (id, task_hash, task, strategy, model, accepted, verified, score, final_code, "
+                "analysis, started_at, finished_at, latency, prompt_tokens, completion_tokens) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                run_rows,
+            )
+            conn.executemany("INSERT OR REPLACE INTO stages VALUES (?, ?, ?, ?, ?)", stage_rows)
+            conn.executemany("INSERT OR REPLACE INTO candidates VALUES (?, ?, ?, ?)", candidate_rows)
+            conn.executemany("INSERT OR REPLACE INTO test_outcomes VALUES (?, ?, ?, ?, ?)", outcome_rows)
+
+    # Queries
+
+    def latency_percentile(self, p: float = 95, by: str = "strategy", since: float = None) -> dict:
+        """Returns {group: {"count", "p<p>"}} of run latency grouped by strategy or model."""
+        if by not in ("strategy", "model"):
+            raise ValueError("by must be 'strategy' or 'model'")
+        sql = f"SELECT {by} AS grp, latency FROM runs"
+        params = ()
+        if since is not None:
+            sql += " WHERE started_at >= ?"
+            params = (since,)
+        groups = {}
+        with closing(self._connect()) as conn:
+            for row in conn.execute(sql, params):
+                groups.setdefault(row["grp"], []).append(row["latency"])
+        return {group: {"count": len(values), f"p{p:g}": percentile(values, p)} for group, values in groups.items()}
+
+    def stage_latency_percentile(self, p: float = 95, since: float = None) -> dict:
+        sql = "SELECT stage, latency FROM stages WHERE latency IS NOT NULL"
+        params = ()
+        if since is not None:
+            sql = ("SELECT stages.stage, stages.latency FROM stages JOIN runs ON runs.id = stages.run_id "
+                   "WHERE stages.latency IS NOT NULL AND runs.started_at >= ?")
+            params = (since,)
+        groups = {}
+        with closing(self._connect()) as conn:
+            for row in conn.execute(sql, params):
+                groups.setdefault(row["stage"], []).append(row["latency"])
+        return {stage: {"count": len(values), f"p{p:g}": percentile(values, p)} for stage, values in groups.items()}
+
+    def last_accepted(self, task: str, strategy: str = None):
+        """Returns the most recent run of `task` whose tests passed, or None."""
+        sql = "SELECT * FROM runs WHERE task_hash = ? AND accepted = 1"
+        params = [task_hash(task)]
+        if strategy:
+            sql += " AND strategy = ?"
+            params.append(strategy)
+        with closing(self._connect()) as conn:
+            row = conn.execute(sql + " ORDER BY finished_at DESC LIMIT 1", params).fetchone()
+        return dict(row) if row else None
+
+    def recent_runs(self, limit: int = 20, strategy: str = None) -> list:
+        sql = "SELECT id, task, strategy, model, accepted, verified, score, latency, prompt_tokens, completion_tokens, finished_at FROM runs"
+        params = []
+        if strategy:
+            sql += " WHERE strategy = ?"
+            params.append(strategy)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(sql + " ORDER BY finished_at DESC LIMIT ?", params + [limit]).fetchall()
+        return [dict(row) for row in rows]
+
+    def test_outcomes(self, run_id: str) -> list:
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT * FROM test_outcomes WHERE run_id = ? ORDER BY test_id", (run_id,)).fetchall()
+        return [dict(row) for row in rows]
+
+
+def token_usage(agents: dict) -> dict:
+    """Sums cumulative token usage over the distinct model clients behind `agents`."""
+    usage = {"prompt_tokens": 0, "completion_tokens": 0}
+    seen = set()
+    for agent in agents.values():
+        client = getattr(agent, "_model_client", None)
+        if client is None or id(client) in seen or not hasattr(client, "total_usage"):
+            continue
+        seen.add(id(client))
+        total = client.total_usage()
+        usage["prompt_tokens"] += total.prompt_tokens
+        usage["completion_tokens"] += total.completion_tokens
+    return usage
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the pipeline run history.")
+    parser.add_argument("--db", default=RUNSTORE_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    latency = commands.add_parser("latency", help="Latency percentile per strategy, model or stage")
+    latency.add_argument("--p", type=float, default=95)
+    latency.add_argument("--by", choices=["strategy", "model", "stage"], default="strategy")
+    latency.add_argument("--since-hours", type=float)
+
+    last = commands.add_parser("last-accepted", help="Last accepted solution for a task")
+    last.add_argument("task")
+    last.add_argument("--strategy")
+
+    recent = commands.add_parser("recent", help="Most recent runs")
+    recent.add_argument("--limit", type=int, default=20)
+    recent.add_argument("--strategy")
+
+    args = parser.parse_args()
+    store = RunStore(args.db)
+    if args.command == "latency":
+        since = time.time() - args.since_hours * 3600 if args.since_hours else None
+        if args.by == "stage":
+            output = store.stage_latency_percentile(args.p, since)
+        else:
+            output = store.latency_percentile(args.p, args.by, since)
+        print(json.dumps(output, indent=2))
+    elif args.command == "last-accepted":
+        run = store.last_accepted(args.task, args.strategy)
+        if run:
+            print(f"# Run {run['id']} [{run['strategy']}] score={run['score']}")
+            print(run["final_code"])
+        else:
+            print("No accepted solution found for this task.")
+    else:
+        print(json.dumps(store.recent_runs(args.limit, args.strategy), indent=2, default=str))
+    store.close()
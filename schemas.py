@@ -0,0 +1,104 @@
+# schemas.py
+import re
+from typing import Any, List, Optional
+from pydantic import BaseModel, ValidationError, field_validator, model_validator
+from utils import load_json
+
+STRATEGIES = ("CODE_FIRST", "PSEUDOCODE_FIRST", "NEURO_SYMBOLIC")
+
+
+class Critique(BaseModel):
+    """Reviewer verdict on a candidate implementation."""
+    score: float
+    issues: List[str] = []
+    fixes: List[str] = []
+
+    @field_validator("score", mode="before")
+    @classmethod
+    def _numeric_score(cls, value):
+        # Models often answer "8/10" or "8 out of 10"
+        if isinstance(value, str):
+            match = re.search(r'-?\d+(?:\.\d+)?', value)
+            if match:
+                return float(match.group())
+        return value
+
+    @field_validator("issues", "fixes", mode="before")
+    @classmethod
+    def _as_text_list(cls, value):
+        if value is None:
+            return []
+        if not isinstance(value, list):
+            value = [value]
+        return [item if isinstance(item, str) else str(item) for item in value]
+
+
+class TaskAnalysis(BaseModel):
+    """Task analyzer's strategy recommendation."""
+    reasoning_strategy: str = "CODE_FIRST"
+    complexity: Optional[float] = None
+    explanation: str = ""
+
+    @field_validator("reasoning_strategy", mode="before")
+    @classmethod
+    def _known_strategy(cls, value):
+        value = str(value or "").strip().upper().replace("-", "_").replace(" ", "_")
+        return value if value in STRATEGIES else "CODE_FIRST"
+
+
+class TestCase(BaseModel):
+    input: Any = []
+    expected: Any
+
+    @model_validator(mode="before")
+    @classmethod
+    def _accept_aliases(cls, data):
+        # Prompts and models disagree on field names ("inputs", "expected_output", "output")
+        if isinstance(data, dict):
+            data = dict(data)
+            if "input" not in data and "inputs" in data:
+                data["input"] = data.pop("inputs")
+            for alias in ("expected_output", "output"):
+                if "expected" not in data and alias in data:
+                    data["expected"] = data.pop(alias)
+        return data
+
+
+class TestSuite(BaseModel):
+    test_cases: List[TestCase] = []
+
+    @model_validator(mode="before")
+    @classmethod
+    def _wrap_and_filter(cls, data):
+        if isinstance(data, list):
+            data = {"test_cases": data}
+        if isinstance(data, dict) and isinstance(data.get("test_cases"), list):
+            # Drop cases cut off before their expected value (e.g. truncated output)
+            data = dict(data, test_cases=[case for case in data["test_cases"] if _is_complete_case(case)])
+        return data
+
+
+def _is_complete_case(case) -> bool:
+    return isinstance(case, dict) and any(key in case for key in ("expected", "expected_output", "output"))
+
+
+def parse_structured(response, model: type):
+    """Validates an agent response against `model`, repairing malformed JSON locally.
+
+    Accepts the agent's raw reply text, an already-parsed dict/list, or a model instance.
+    Returns None if nothing valid can be recovered.
+    """
+    if isinstance(response, model):
+        return response
+    if isinstance(response, BaseModel):
+        data = response.model_dump()
+    elif isinstance(response, (dict, list)):
+        data = response
+    else:
+        data = load_json(str(response))
+        if data is None:
+            return None
+    try:
+        return model.model_validate(data)
+    except ValidationError:
+        return None
@@ -0,0 +1,214 @@
+# search.py
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import sqlite3
+import argparse
+from contextlib import closing
+
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", "search_cache.db")
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "ddgs")
+SEARCH_FIXTURE_PATH = os.getenv("SEARCH_FIXTURE_PATH", "search_fixtures.json")
+SEARCH_DEADLINE = float(os.getenv("SEARCH_DEADLINE", "15"))
+# Opt-in: analysis makes no network calls unless ANALYZER_SEARCH=1
+ANALYZER_SEARCH = os.getenv("ANALYZER_SEARCH", "0") == "1"
+
+
+def _normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class DDGSBackend:
+    """DuckDuckGo text search. The client is blocking, so it runs in a worker thread."""
+
+    name = "ddgs"
+
+    def __init__(self, max_results: int = 5):
+        self.max_results = max_results
+
+    async def search(self, query: str) -> list:
+        return await asyncio.to_thread(self._search_sync, query)
+
+    def _search_sync(self, query: str) -> list:
+        # Imported lazily so offline backends work without the package installed
+        from duckduckgo_search import DDGS
+        with DDGS() as ddgs:
+            results = ddgs.text(query, max_results=self.max_results)
+            return [{"title": res["title"], "snippet": res["body"], "url": res["href"]} for res in results]
+
+
+class FixtureBackend:
+    """Offline search over a local JSON index, for tests and air-gapped runs.
+
+    The index is either {"query": [results]} for exact lookups, or a list of
+    {"title", "snippet", "url"} documents ranked by how many query terms they contain.
+    """
+
+    name = "fixture"
+
+    def __init__(self, index_path: str = SEARCH_FIXTURE_PATH, index=None, max_results: int = 5):
+        if index is None:
+            with open(index_path, "r") as f:
+                index = json.load(f)
+        self.max_results = max_results
+        self.queries = {_normalize_query(q): docs for q, docs in index.items()} if isinstance(index, dict) else {}
+        self.documents = index if isinstance(index, list) else [doc for docs in index.values() for doc in docs]
+
+    async def search(self, query: str) -> list:
+        normalized = _normalize_query(query)
+        if normalized in self.queries:
+            return self.queries[normalized][:self.max_results]
+        terms = set(re.findall(r'\w+', normalized))
+        scored = []
+        for doc in self.documents:
+            words = set(re.findall(r'\w+', f"{doc.get('title', '')} {doc.get('snippet', '')}".lower()))
+            score = len(terms & words)
+            if score:
+                scored.append((score, doc))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [doc for _, doc in scored[:self.max_results]]
+
+
+class SearchCache:
+    """Persistent query -> results cache in SQLite, with per-lookup TTL."""
+
+    def __init__(self, path: str = SEARCH_CACHE_PATH):
+        self.path = path
+        with closing(self._connect()) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS search_cache (
+                    key TEXT PRIMARY KEY,
+                    backend TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    results TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )""")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @staticmethod
+    def _key(backend: str, query: str) -> str:
+        return hashlib.sha256(f"{backend}\0{_normalize_query(query)}".encode("utf-8")).hexdigest()
+
+    def get(self, backend: str, query: str, ttl: float):
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT results FROM search_cache WHERE key = ? AND created_at >= ?",
+                (self._key(backend, query), time.time() - ttl),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, backend: str, query: str, results: list):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO search_cache VALUES (?, ?, ?, ?, ?)",
+                (self._key(backend, query), backend, _normalize_query(query), json.dumps(results), time.time()),
+            )
+
+    def purge(self, ttl: float) -> int:
+        with closing(self._connect()) as conn, conn:
+            return conn.execute("DELETE FROM search_cache WHERE created_at < ?", (time.time() - ttl,)).rowcount
+
+
+class WebSearch:
+    """Async search front end: cache lookup, per-query timeout, and concurrent multi-query search."""
+
+    def __init__(self, backend=None, cache: SearchCache = None, ttl: float = 24 * 3600, timeout: float = 10.0):
+        self.backend = backend or DDGSBackend()
+        self.cache = cache
+        self.ttl = ttl
+        self.timeout = timeout
+
+    async def search(self, query: str) -> list:
+        """Returns a list of {"title", "snippet", "url"}; empty on timeout or backend error (not cached)."""
+        if self.cache:
+            # SQLite calls block, so they stay off the event loop
+            cached = await asyncio.to_thread(self.cache.get, self.backend.name, query, self.ttl)
+            if cached is not None:
+                return cached
+        try:
+            results = await asyncio.wait_for(self.backend.search(query), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            print(f"⏰ Web search timed out for: '{query}'")
+            return []
+        except Exception as e:
+            print(f"An error occurred during web search: {e}")
+            return []
+        if self.cache:
+            await asyncio.to_thread(self.cache.put, self.backend.name, query, results)
+        return results
+
+    async def search_many(self, queries: list, deadline: float = 15.0) -> dict:
+        """Runs distinct queries concurrently; those unfinished at the deadline map to []."""
+        unique = list(dict.fromkeys(queries))
+        tasks = {query: asyncio.ensure_future(self.search(query)) for query in unique}
+        if not tasks:
+            return {}
+        await asyncio.wait(tasks.values(), timeout=deadline)
+        results = {}
+        pending = []
+        for query, task in tasks.items():
+            if task.done():
+                results[query] = task.result()
+            else:
+                task.cancel()
+                pending.append(task)
+                results[query] = []
+        await asyncio.gather(*pending, return_exceptions=True)
+        return results
+
+
+def summarize_results(query: str, results: list, max_results: int = 3, max_snippet: int = 160) -> str:
+    """Compact text rendering of search results for analyzer prompts."""
+    if not results:
+        return f"No results found for '{query}'."
+    lines = [f"Search results for '{query}':"]
+    for res in results[:max_results]:
+        snippet = " ".join(str(res.get("snippet", "")).split())
+        if len(snippet) > max_snippet:
+            snippet = snippet[:max_snippet].rstrip() + "…"
+        lines.append(f"- {res.get('title', '')}: {snippet} ({res.get('url', '')})")
+    return "\n".join(lines)
+
+
+def research_summary(queries: list, deadline: float = SEARCH_DEADLINE, search: "WebSearch" = None) -> str:
+    """Searches `queries` concurrently from synchronous code; returns the joined summaries, or "" if nothing was found."""
+    search = search or default_web_search()
+    # A private loop rather than asyncio.run: closing it does not wait on backend threads still running past the deadline
+    loop = asyncio.new_event_loop()
+    try:
+        results = loop.run_until_complete(search.search_many(queries, deadline))
+    finally:
+        loop.close()
+    return "\n\n".join(summarize_results(query, found) for query, found in results.items() if found)
+
+
+_default_search = None
+
+
+def default_web_search() -> WebSearch:
+    """Shared WebSearch configured from SEARCH_BACKEND / SEARCH_FIXTURE_PATH / SEARCH_CACHE_PATH."""
+    global _default_search
+    if _default_search is None:
+        backend = FixtureBackend(SEARCH_FIXTURE_PATH) if SEARCH_BACKEND == "fixture" else DDGSBackend()
+        _default_search = WebSearch(backend, SearchCache())
+    return _default_search
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run web searches through the cached search front end.")
+    parser.add_argument("queries", nargs="+")
+    parser.add_argument("--backend", choices=["ddgs", "fixture"], default=SEARCH_BACKEND)
+    parser.add_argument("--fixtures", default=SEARCH_FIXTURE_PATH)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--deadline", type=float, default=SEARCH_DEADLINE)
+    args = parser.parse_args()
+    backend = FixtureBackend(args.fixtures) if args.backend == "fixture" else DDGSBackend()
+    search = WebSearch(backend, None if args.no_cache else SearchCache())
+    print(research_summary(args.queries, args.deadline, search) or "No results found.")
@@ -0,0 +1,305 @@
+# service.py
+import json
+import time
+import uuid
+import queue
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from agents import create_all_agents, reset_agents
+from checkpoint import CheckpointStore
+from main import solve_task
+from runstore import RunStore
+from schemas import STRATEGIES
+from tools import EXECUTION_CACHE
+
+FINISHED_STATES = ("succeeded", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker when its job was cancelled between stages."""
+
+
+class Job:
+    """A queued task together with its status and progress event log."""
+
+    def __init__(self, task: str, strategy: str = None):
+        self.id = uuid.uuid4().hex
+        self.task = task
+        self.strategy = strategy
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.events = []
+        self.cancel_requested = threading.Event()
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def emit(self, event: str, data=None):
+        with self._cond:
+            self.events.append({"seq": len(self.events), "time": time.time(), "event": event, "data": data})
+            self._cond.notify_all()
+
+    def finish(self, status: str, result=None, error: str = None):
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished_at = time.time()
+        self.emit(status, {"error": error} if error else None)
+
+    def events_since(self, index: int, timeout: float = 15.0) -> list:
+        """Blocks until events past `index` exist, the job finishes, or the timeout expires."""
+        with self._cond:
+            self._cond.wait_for(lambda: len(self.events) > index or self.finished, timeout=timeout)
+            return self.events[index:]
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "task": self.task,
+            "strategy": self.strategy,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "event_count": len(self.events),
+        }
+
+
+class JobService:
+    """Runs tasks on a fixed pool of workers, each holding its own warm set of agents.
+
+    Agents keep conversation state, so they are never shared between workers and are reset
+    before each job; they are created without a user proxy, so no chat waits on stdin. At most
+    `max_queue` jobs may wait at once; `submit` raises `queue.Full` instead of accepting work it
+    cannot start soon. Cancellation takes effect immediately for queued jobs (freeing their slot)
+    and at the next stage boundary for running ones.
+    """
+
+    def __init__(self, workers: int = 2, max_queue: int = 16, max_jobs: int = 1000, checkpoints: CheckpointStore = None, run_store: RunStore = None):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_jobs = max_jobs
+        self.checkpoints = checkpoints or CheckpointStore()
+        self.run_store = run_store
+        self.jobs = {}
+        # Unbounded hand-off to workers; capacity is enforced on the count of waiting jobs, so a
+        # cancelled job stops counting as soon as it is cancelled rather than when a worker skips it
+        self._queue = queue.Queue()
+        self._waiting = 0
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            print(f"🔧 Warming up worker {i + 1}/{self.workers}...")
+            agents = create_all_agents(interactive=False)
+            thread = threading.Thread(target=self._worker, args=(agents,), name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self.run_store:
+            self.run_store.flush()
+
+    def submit(self, task: str, strategy: str = None) -> Job:
+        job = Job(task, strategy)
+        # Emitted before the job is visible to workers, so "queued" always precedes "started"
+        job.emit("queued")
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                raise queue.Full()
+            self._waiting += 1
+            self.jobs[job.id] = job
+            self._prune()
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str):
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return job
+        with self._lock:
+            job.cancel_requested.set()
+            if job.status == "queued":
+                self._waiting -= 1
+                job.finish("cancelled")
+        return job
+
+    def stats(self) -> dict:
+        statuses = [job.status for job in list(self.jobs.values())]
+        return {
+            "workers": self.workers,
+            "queued": self._waiting,
+            "queue_capacity": self.max_queue,
+            "running": statuses.count("running"),
+            "jobs": len(statuses),
+            "execution_cache": EXECUTION_CACHE.stats(),
+        }
+
+    def _prune(self):
+        # Forget the oldest finished jobs once the table grows past max_jobs
+        overflow = len(self.jobs) - self.max_jobs
+        if overflow <= 0:
+            return
+        finished = sorted((job for job in self.jobs.values() if job.finished), key=lambda job: job.finished_at)
+        for job in finished[:overflow]:
+            del self.jobs[job.id]
+
+    def _worker(self, agents: dict):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                if job.status != "queued":
+                    continue
+                self._waiting -= 1
+                job.status = "running"
+            self._run(job, agents)
+
+    def _run(self, job: Job, agents: dict):
+        job.started_at = time.time()
+        job.emit("started")
+
+        def on_stage(stage, data):
+            job.emit(stage, data)
+            if job.cancel_requested.is_set():
+                raise JobCancelled()
+
+        choose_strategy = (lambda recommended: job.strategy) if job.strategy else None
+        try:
+            # Agents keep their message history between runs; start every job from a clean context
+            reset_agents(agents)
+            result = solve_task(job.task, agents, self.checkpoints, choose_strategy=choose_strategy, on_stage=on_stage, run_store=self.run_store)
+            job.finish("succeeded", result=result)
+        except JobCancelled:
+            job.finish("cancelled")
+        except Exception as e:
+            print(f"❌ Job {job.id} failed: {e}")
+            job.finish("failed", error=str(e))
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """JSON API: POST /jobs, GET /jobs/<id>, GET /jobs/<id>/events, DELETE /jobs/<id>, GET /health."""
+
+    service: JobService = None
+
+    def _send_json(self, status: int, payload, headers: dict = None):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self):
+        parts = [part for part in self.path.split("?")[0].split("/") if part]
+        job = self.service.get(parts[1]) if len(parts) >= 2 and parts[0] == "jobs" else None
+        return parts, job
+
+    def do_POST(self):
+        parts, _ = self._route()
+        if parts != ["jobs"]:
+            return self._send_json(404, {"error": "Not found"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except (ValueError, json.JSONDecodeError):
+            return self._send_json(400, {"error": "Request body must be JSON"})
+
+        task = str(payload.get("task", "")).strip()
+        strategy = payload.get("strategy")
+        if not task:
+            return self._send_json(400, {"error": "Missing 'task'"})
+        if strategy is not None and strategy not in STRATEGIES:
+            return self._send_json(400, {"error": f"'strategy' must be one of {list(STRATEGIES)}"})
+
+        try:
+            job = self.service.submit(task, strategy)
+        except queue.Full:
+            return self._send_json(429, {"error": "Job queue is full, retry later"}, {"Retry-After": "5"})
+        self._send_json(202, job.to_dict(), {"Location": f"/jobs/{job.id}"})
+
+    def do_GET(self):
+        parts, job = self._route()
+        if parts == ["health"]:
+            return self._send_json(200, self.service.stats())
+        if job is None:
+            return self._send_json(404, {"error": "Unknown job"})
+        if len(parts) == 2:
+            return self._send_json(200, job.to_dict())
+        if len(parts) == 3 and parts[2] == "events":
+            return self._stream_events(job)
+        self._send_json(404, {"error": "Not found"})
+
+    def do_DELETE(self):
+        parts, job = self._route()
+        if job is None or len(parts) != 2:
+            return self._send_json(404, {"error": "Unknown job"})
+        if job.finished:
+            return self._send_json(409, job.to_dict())
+        self._send_json(200, self.service.cancel(job.id).to_dict())
+
+    def _stream_events(self, job: Job):
+        """Streams the job's events as newline-delimited JSON until it finishes."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        index = 0
+        try:
+            while True:
+                events = job.events_since(index)
+                for event in events:
+                    self.wfile.write((json.dumps(event, default=str) + "\n").encode("utf-8"))
+                self.wfile.flush()
+                index += len(events)
+                if job.finished and index >= len(job.events):
+                    return
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+
+def serve(host: str = "127.0.0.1", port: int = 8765, workers: int = 2, max_queue: int = 16):
+    service = JobService(workers=workers, max_queue=max_queue, run_store=RunStore())
+    service.start()
+    JobRequestHandler.service = service
+    server = ThreadingHTTPServer((host, port), JobRequestHandler)
+    print(f"🚀 Service listening on http://{host}:{port} ({workers} workers, queue of {max_queue})")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        service.stop()
+        service.run_store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the code generation pipelines as a local HTTP service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--max-queue", type=int, default=16)
+    args = parser.parse_args()
+    try:
+        serve(args.host, args.port, args.workers, args.max_queue)
+    except KeyboardInterrupt:
+        print("\n\n👋 Service stopped.")
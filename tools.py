@@ -1,14 +1,159 @@
 # tools.py
+import os
+import ast
 import json
-from duckduckgo_search import DDGS
+import hashlib
+import threading
+from collections import OrderedDict
+
+PREVIEW_CHARS = 120
+
+
+def _serialize(value) -> str:
+    try:
+        return json.dumps(value, sort_keys=True, default=repr)
+    except (TypeError, ValueError):
+        return repr(value)
+
+
+def _truncate(text: str, limit: int) -> str:
+    return text if len(text) <= limit else f"{text[:limit]}… (+{len(text) - limit} chars)"
+
+
+def preview(value, limit: int = PREVIEW_CHARS) -> str:
+    return _truncate(_serialize(value), limit)
+
+
+def summarize_value(value, limit: int = PREVIEW_CHARS) -> dict:
+    """Compact stand-in for a test value: type, length, content hash and a truncated preview."""
+    text = _serialize(value)
+    return {
+        "type": type(value).__name__,
+        "size": len(value) if isinstance(value, (str, bytes, list, tuple, dict, set)) else None,
+        "hash": hashlib.sha1(text.encode("utf-8")).hexdigest()[:12],
+        "preview": _truncate(text, limit),
+    }
+
+
+def structural_diff(expected, actual, path: str = "value"):
+    """Describes the first place where `actual` departs from `expected`, or None if equal."""
+    if expected == actual:
+        return None
+    both_numbers = isinstance(expected, (int, float)) and isinstance(actual, (int, float))
+    both_sequences = isinstance(expected, (list, tuple)) and isinstance(actual, (list, tuple))
+    if type(expected) != type(actual) and not (both_numbers or both_sequences):
+        return f"{path}: expected {type(expected).__name__}, got {type(actual).__name__} ({preview(actual)})"
+    if isinstance(expected, dict):
+        missing = [key for key in expected if key not in actual]
+        if missing:
+            return f"{path}: missing key {missing[0]!r}"
+        extra = [key for key in actual if key not in expected]
+        if extra:
+            return f"{path}: unexpected key {extra[0]!r}"
+        for key in expected:
+            diff = structural_diff(expected[key], actual[key], f"{path}[{key!r}]")
+            if diff:
+                return diff
+    if isinstance(expected, (list, tuple)):
+        for i, (exp_item, act_item) in enumerate(zip(expected, actual)):
+            diff = structural_diff(exp_item, act_item, f"{path}[{i}]")
+            if diff:
+                return diff
+        if len(expected) != len(actual):
+            return f"{path}: expected length {len(expected)}, got {len(actual)}"
+        if type(expected) != type(actual):
+            return f"{path}: expected {type(expected).__name__}, got {type(actual).__name__}"
+    if isinstance(expected, str) and isinstance(actual, str):
+        index = next((i for i, (a, b) in enumerate(zip(expected, actual)) if a != b), min(len(expected), len(actual)))
+        return f"{path}: strings differ at index {index} (expected {preview(expected[index:index + 20])}, got {preview(actual[index:index + 20])})"
+    return f"{path}: expected {preview(expected)}, got {preview(actual)}"
+
+
+def code_hash(python_code: str) -> str:
+    """Hash of the code's AST, so formatting, comments and whitespace-only edits hash the same."""
+    try:
+        normalized = ast.dump(ast.parse(python_code))
+    except SyntaxError:
+        normalized = python_code.strip()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def test_case_hash(test_case) -> str:
+    return hashlib.sha1(_serialize(test_case).encode("utf-8")).hexdigest()
+
+
+class ExecutionCache:
+    """LRU cache of per-test results keyed by (normalized code hash, test case hash).
+
+    Assumes candidates are deterministic; pass `cache=None` to PythonCodeRunner to opt out.
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, code_key: str, case_key: str):
+        with self._lock:
+            result = self._entries.get((code_key, case_key))
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((code_key, case_key))
+            self.hits += 1
+            return dict(result)
+
+    def put(self, code_key: str, case_key: str, result: dict):
+        with self._lock:
+            self._entries[(code_key, case_key)] = dict(result)
+            self._entries.move_to_end((code_key, case_key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared by every runner so repeated verification rounds across the pipeline reuse results
+EXECUTION_CACHE = ExecutionCache()
+
+# When set, every runner writes each test's full payload under this directory (CLI, service and workers alike)
+TEST_SPILL_DIR = os.getenv("TEST_SPILL_DIR") or None
+
 
 class PythonCodeRunner:
     """Real Python code runner that executes generated code."""
-    def __init__(self):
+    def __init__(self, cache: ExecutionCache = EXECUTION_CACHE, spill_dir: str = TEST_SPILL_DIR):
         self.namespace = {}
+        self.cache = cache
+        self.spill_dir = spill_dir
     
-    def run_code_with_tests(self, python_code, test_cases):
-        results = []
+    def run_code_with_tests(self, python_code, test_cases, spill_dir: str = None):
+        """Runs each test case and returns compact results.
+
+        Inputs and values are kept only as summaries (hash, size, preview) plus a structural diff.
+        Only (code, test case) pairs missing from the execution cache are run; the code itself is
+        not executed at all when every case is cached. Pass `spill_dir` (or set TEST_SPILL_DIR) to also
+        write each case's full payload to disk (this bypasses cached results); its path is recorded
+        under "payload_path".
+        """
+        spill_dir = spill_dir or self.spill_dir
         try:
             if isinstance(test_cases, str):
                 test_data = json.loads(test_cases)
@@ -16,6 +161,21 @@ class PythonCodeRunner:
                 test_data = test_cases
             if not isinstance(test_data, list):
                 test_data = [test_data]
+
+            use_cache = self.cache is not None and not spill_dir
+            code_key = code_hash(python_code) if use_cache else None
+            results, pending = [], []
+            for i, test_case in enumerate(test_data):
+                case_key = test_case_hash(test_case) if use_cache else None
+                cached = self.cache.get(code_key, case_key) if use_cache else None
+                if cached is not None:
+                    cached["test_id"] = i
+                results.append(cached)
+                if cached is None:
+                    pending.append((i, test_case, case_key))
+            if not pending:
+                return results
+
             exec_namespace = {}
             exec(python_code, exec_namespace)
             main_function = None
@@ -25,7 +185,8 @@ class PythonCodeRunner:
                     break
             if not main_function:
                 return [{"error": "No callable function found in generated code", "passed": False}]
-            for i, test_case in enumerate(test_data):
+            for i, test_case, case_key in pending:
+                inputs, expected, actual_output, error = "Unknown", "Unknown", None, None
                 try:
                     if isinstance(test_case, dict):
                         inputs = test_case.get("input", test_case.get("inputs", []))
@@ -40,31 +201,43 @@ class PythonCodeRunner:
                     else:
                         actual_output = main_function(inputs)
                     passed = actual_output == expected
-                    results.append({"test_id": i, "passed": passed, "input": inputs, "expected": expected, "actual": actual_output, "error": None})
                 except Exception as e:
-                    results.append({"test_id": i, "passed": False, "input": locals().get('inputs', "Unknown"), "expected": locals().get('expected', "Unknown"), "actual": None, "error": str(e)})
+                    passed, error = False, str(e)
+                result = {
+                    "test_id": i,
+                    "passed": passed,
+                    "input": summarize_value(inputs),
+                    "expected": summarize_value(expected),
+                    "actual": summarize_value(actual_output),
+                    "diff": None if passed or error else structural_diff(expected, actual_output),
+                    "error": error,
+                }
+                if spill_dir:
+                    result["payload_path"] = self._spill(spill_dir, python_code, test_case, i, inputs, expected, actual_output)
+                if use_cache:
+                    self.cache.put(code_key, case_key, result)
+                results[i] = result
             return results
         except Exception as e:
             return [{"error": f"Code execution failed: {str(e)}", "passed": False}]
 
+    @staticmethod
+    def _spill(spill_dir: str, python_code: str, test_case, test_id: int, inputs, expected, actual) -> str:
+        os.makedirs(spill_dir, exist_ok=True)
+        source_hash = hashlib.sha1(python_code.encode("utf-8")).hexdigest()[:12]
+        # The case hash keeps different suites run against the same code from overwriting each other
+        path = os.path.join(spill_dir, f"{source_hash}-{test_case_hash(test_case)[:12]}-{test_id}.json")
+        with open(path, "w") as f:
+            json.dump({"input": inputs, "expected": expected, "actual": actual}, f, default=repr)
+        return path
+
     def run_code_safely(self, python_code: str) -> dict:
         """Executes Python code safely without requiring test cases."""
         try:
             exec_namespace = {}
             exec(python_code, exec_namespace)
-            return {"success": True, "message": "Code executed successfully.", "namespace": exec_namespace}
+            # Only names are returned; handing back the namespace would keep every object alive
+            defined = sorted(name for name in exec_namespace if not name.startswith('_'))
+            return {"success": True, "message": "Code executed successfully.", "defined": defined}
         except Exception as e:
             return {"success": False, "error": str(e)}
-     
-def web_search(query: str) -> str:
-    """Performs a web search using DuckDuckGo and returns the top results."""
-    print(f"🔎 Performing web search for: '{query}'")
-    try:
-        with DDGS() as ddgs:
-            results = list(ddgs.text(query, max_results=5))
-            if not results:
-                return "No results found."
-            formatted_results = "\n\n".join([f"Title: {res['title']}\nSnippet: {res['body']}\nURL: {res['href']}" for res in results])
-            return f"Search results for '{query}':\n\n{formatted_results}"
-    except Exception as e:
-        return f"An error occurred during web search: {e}"
\ No newline at end of file
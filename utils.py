@@ -1,17 +1,26 @@
 # utils.py
 import re
+import ast
 import json
 import asyncio
 from autogen_agentchat.agents import AssistantAgent, UserProxyAgent
+from autogen_core import CancellationToken
 from autogen_agentchat.messages import TextMessage
 from autogen_agentchat.teams import RoundRobinGroupChat
 
 
 async def safe_initiate_chat(agent: AssistantAgent, message: str, user_proxy: UserProxyAgent, max_turns: int = 3):
-    """Safely initiate chat with error handling using v6.0 API."""
+    """Safely initiate chat with error handling using v6.0 API.
+
+    Without a user_proxy (headless runs) the agent answers the task alone in a single turn.
+    """
     try:
         # Create a simple two-agent team
-        team = RoundRobinGroupChat([user_proxy, agent])
+        if user_proxy is None:
+            team = RoundRobinGroupChat([agent])
+            max_turns = 1
+        else:
+            team = RoundRobinGroupChat([user_proxy, agent])
         
         # Run the conversation
         chat_result = await team.run(
@@ -46,9 +55,11 @@ async def get_agent_response(agent: AssistantAgent, message: str):
         text_message = TextMessage(content=message, source="user")
         
         # Get response from agent
-        response = await agent.on_messages([text_message], cancellation_token=None)
+        response = await agent.on_messages([text_message], cancellation_token=CancellationToken())
         
-        if response and hasattr(response, 'content'):
+        if response and hasattr(response, 'chat_message'):
+            return response.chat_message.content
+        elif response and hasattr(response, 'content'):
             return response.content
         elif isinstance(response, str):
             return response
@@ -119,6 +130,144 @@ def extract_json_from_response(response: str) -> str:
     return response
 
 
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+def _drop_trailing(out: list, tokens: tuple):
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] in tokens:
+        out.pop()
+        while out and out[-1].isspace():
+            out.pop()
+
+
+def repair_json(text: str) -> str:
+    r"""Best-effort rewrite of an LLM's almost-JSON reply into valid JSON text.
+
+    Handles prose and code fences around the payload, single-quoted strings, bare keys,
+    Python literals, // and /* */ comments, trailing commas and output truncated mid-structure.
+    Returns "" if the text contains no object or array.
+
+    >>> repair_json("Sure! {'score': 8, issues: ['slow',], fixes: None}")
+    '{"score": 8, "issues": ["slow"], "fixes": null}'
+    >>> repair_json('{"score": 7, // out of 10\n "issues": [] /* none */}')
+    '{"score": 7, \n "issues": []}'
+    >>> repair_json('[{"input": [1], "expected": 2}, {"input": [2], "exp')
+    '[{"input": [1], "expected": 2}, {"input": [2]}]'
+    >>> repair_json("no json here")
+    ''
+    """
+    fence = re.search(r'```(?:json)?\s*\n(.*?)(?:```|$)', text, re.DOTALL)
+    if fence and re.search(r'[\[{]', fence.group(1)):
+        text = fence.group(1)
+    start = re.search(r'[\[{]', text)
+    if not start:
+        return ""
+
+    out, stack = [], []
+    i, n = start.start(), len(text)
+    while i < n:
+        ch = text[i]
+        if ch in "\"'":
+            j, chars = i + 1, []
+            while j < n and text[j] != ch:
+                if text[j] == "\\" and j + 1 < n:
+                    chars.append("'" if text[j + 1] == "'" else text[j:j + 2])
+                    j += 2
+                    continue
+                chars.append({'"': '\\"', "\n": "\\n", "\t": "\\t"}.get(text[j], text[j]))
+                j += 1
+            out.append('"' + "".join(chars) + '"')
+            i = j + 1
+            continue
+        if text.startswith(("//", "/*"), i):
+            # Comments are not JSON; skip to the end of the line or the closing */
+            end = text.find("\n" if text[i + 1] == "/" else "*/", i + 2)
+            i = n if end == -1 else (end if text[i + 1] == "/" else end + 2)
+            continue
+        if ch.isalpha() or ch == "_":
+            word = re.match(r'\w+', text[i:]).group()
+            i += len(word)
+            if word in _PYTHON_LITERALS:
+                out.append(_PYTHON_LITERALS[word])
+            elif re.match(r'\s*:', text[i:]):
+                out.append(f'"{word}"')
+            else:
+                out.append(word)
+            continue
+        if ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            out.append(ch)
+        elif ch in "}]":
+            _drop_trailing(out, (",",))
+            out.append(stack.pop() if stack else ch)
+            if not stack:
+                break
+        else:
+            out.append(ch)
+        i += 1
+
+    if stack:
+        # Truncated: drop a dangling separator or key, then close what is still open
+        _drop_trailing(out, (",", ":"))
+        if stack[-1] == "}" and out and out[-1].startswith('"'):
+            before = [tok for tok in out[:-1] if not tok.isspace()]
+            if before and before[-1] in ("{", ","):
+                out.pop()
+                _drop_trailing(out, (",",))
+        out.extend(reversed(stack))
+    return "".join(out)
+
+
+def load_json(response: str):
+    """Parses JSON from an agent response, repairing it locally if needed. Returns None on failure."""
+    candidate = extract_json_from_response(response)
+    try:
+        return json.loads(candidate)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(repair_json(response))
+    except json.JSONDecodeError:
+        pass
+    try:
+        value = ast.literal_eval(candidate)
+        return value if isinstance(value, (dict, list)) else None
+    except (ValueError, SyntaxError):
+        return None
+
+
+def _value_preview(value):
+    # Runner results hold summaries ({"type", "size", "hash", "preview"}) rather than raw values
+    if isinstance(value, dict) and "preview" in value and "hash" in value:
+        return value["preview"]
+    return value
+
+
+def format_test_results(results, max_failures: int = 5) -> str:
+    """Short plain-text report of test results for correction prompts: a tally plus the first failures."""
+    if not isinstance(results, list) or not results:
+        return "No test results."
+    failures = [r for r in results if not (isinstance(r, dict) and r.get("passed"))]
+    lines = [f"{len(results) - len(failures)}/{len(results)} tests passed."]
+    for result in failures[:max_failures]:
+        if not isinstance(result, dict):
+            lines.append(f"- Invalid result: {str(result)[:200]}")
+            continue
+        line = f"- Test {result.get('test_id', '?')}: input={_value_preview(result.get('input'))}"
+        if result.get("error"):
+            line += f" error={result['error']}"
+        else:
+            line += f" expected={_value_preview(result.get('expected'))} actual={_value_preview(result.get('actual'))}"
+            if result.get("diff"):
+                line += f" ({result['diff']})"
+        lines.append(line)
+    if len(failures) > max_failures:
+        lines.append(f"- ... {len(failures) - max_failures} more failing tests")
+    return "\n".join(lines)
+
+
 def print_test_results(results):
     """Print detailed test results."""
     print("\n📊 DETAILED TEST RESULTS:")
@@ -134,9 +283,11 @@ def print_test_results(results):
         if isinstance(result, dict):
             status = "✅ PASSED" if result.get("passed", False) else "❌ FAILED"
             print(f"Test {i+1}: {status}")
-            print(f"   - Input: {result.get('input', 'N/A')}")
-            print(f"   - Expected: {result.get('expected', 'N/A')}")
-            print(f"   - Actual: {result.get('actual', 'N/A')}")
+            print(f"   - Input: {_value_preview(result.get('input', 'N/A'))}")
+            print(f"   - Expected: {_value_preview(result.get('expected', 'N/A'))}")
+            print(f"   - Actual: {_value_preview(result.get('actual', 'N/A'))}")
+            if result.get("diff"):
+                print(f"   - Diff: {result['diff']}")
             if result.get("error"):
                 print(f"   - Error: {result['error']}")
         else: